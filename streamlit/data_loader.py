@@ -0,0 +1,235 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+import certifi
+import os
+from pathlib import Path
+from pymongo import MongoClient
+from pymongoarrow.api import Schema, aggregate_arrow_all
+
+# ---------------------------------------------------------
+# Meteorology (local CSV)
+# ---------------------------------------------------------
+# Frames returned here are cached with st.cache_resource and shared between
+# pages by reference: treat them as read-only and .copy() before mutating.
+METEO_CSV = Path(__file__).resolve().parent / "Data" / "open_meteo_clean.csv"
+
+
+def _read_csv(csv_path: Path) -> pa.Table:
+    """The CSV as an Arrow table with a UTC 'time' column, sorted by time."""
+    # Parsed by Arrow's multithreaded reader with a typed time column,
+    # so there is no object-string pass followed by to_datetime
+    table = pacsv.read_csv(
+        csv_path,
+        convert_options=pacsv.ConvertOptions(
+            column_types={"time": pa.timestamp("ns")},
+            timestamp_parsers=["%Y-%m-%dT%H:%M", pacsv.ISO8601],
+        ),
+    )
+    if "time" in table.column_names:
+        utc = pc.assume_timezone(table["time"], "UTC")
+        table = table.set_column(table.column_names.index("time"), "time", utc)
+        table = table.sort_by("time")
+    return table
+
+
+def _ensure_parquet(csv_path: Path) -> Path:
+    """Write a Parquet copy of the CSV next to it if missing or older than the CSV.
+
+    Rows are sorted by time and written as one row group per calendar month,
+    so a single month can be read on its own via predicate pushdown.
+    """
+    parquet_path = csv_path.with_suffix(".parquet")
+    if (
+        not parquet_path.exists()
+        or parquet_path.stat().st_mtime < csv_path.stat().st_mtime
+    ):
+        table = _read_csv(csv_path)
+        bounds = np.array([], dtype=int)
+        if "time" in table.column_names:
+            ym = table["time"].to_numpy().astype("datetime64[M]").astype(np.int64)
+            bounds = np.flatnonzero(ym[1:] != ym[:-1]) + 1
+
+        tmp = parquet_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with pq.ParquetWriter(tmp, table.schema, compression="zstd") as writer:
+                for start, stop in zip(np.r_[0, bounds], np.r_[bounds, table.num_rows]):
+                    writer.write_table(table.slice(start, stop - start))
+            os.replace(tmp, parquet_path)  # atomic: readers never see a partial file
+        finally:
+            tmp.unlink(missing_ok=True)
+    return parquet_path
+
+
+def _meteo_source():
+    """Parquet path of the meteo data, or the parsed CSV if it cannot be written."""
+    if not METEO_CSV.exists():
+        raise FileNotFoundError(f"CSV not found at: {METEO_CSV}")
+    try:
+        return _ensure_parquet(METEO_CSV)
+    except OSError:
+        # Read-only deploy (or full disk): serve straight from the CSV
+        return _read_csv(METEO_CSV)
+
+
+@st.cache_resource(show_spinner=False)
+def get_meteo_df() -> pd.DataFrame:
+    """The full meteo frame, shared by reference across pages (read-only)."""
+    source = _meteo_source()
+    if isinstance(source, pa.Table):
+        return source.to_pandas()
+    # Typed Parquet copy: no CSV tokenizing or datetime parsing on load
+    return pd.read_parquet(source, engine="pyarrow")
+
+
+@st.cache_resource(show_spinner=False)
+def get_meteo_first_month() -> pd.DataFrame:
+    """Rows of the first calendar month only, read via predicate pushdown."""
+    source = _meteo_source()
+    dataset = (
+        pads.dataset(source) if isinstance(source, pa.Table)
+        else pads.dataset(source, format="parquet")
+    )
+    if "time" not in dataset.schema.names:
+        return dataset.to_table().to_pandas()
+
+    first_ts = pc.min(dataset.to_table(columns=["time"])["time"]).as_py()
+    if first_ts is None:
+        return dataset.to_table().to_pandas()
+
+    start = pd.Timestamp(first_ts).normalize().replace(day=1)
+    end = start + pd.offsets.MonthBegin(1)
+    month_filter = (
+        (pc.field("time") >= start.to_pydatetime())
+        & (pc.field("time") < end.to_pydatetime())
+    )
+    # Only the matching month's row group is decoded
+    return dataset.to_table(filter=month_filter).to_pandas()
+
+
+# ---------------------------------------------------------
+# Energy production (MongoDB)
+# ---------------------------------------------------------
+# Fixed column types: documents decode straight into Arrow buffers, with no
+# per-document dicts or dtype inference. Missing fields become nulls. The
+# schema doubles as the server-side projection, so only these fields (no
+# _id) cross the wire.
+HOURLY_SCHEMA = Schema({
+    "starttime": pa.timestamp("ms"),
+    "quantitykwh": pa.float64(),
+})
+
+
+@st.cache_resource(show_spinner=False)
+def get_mongo_client() -> MongoClient:
+    """One pooled client per process, shared by every page and rerun.
+
+    zstd (zlib fallback) wire compression shrinks the replies; minPoolSize
+    keeps warm TLS sockets so a cache miss skips the handshake.
+    """
+    cfg = st.secrets["mongo"]
+    client = MongoClient(
+        cfg["uri"],
+        tlsCAFile=certifi.where(),
+        serverSelectionTimeoutMS=8000,
+        compressors="zstd,zlib",
+        maxPoolSize=20,
+        minPoolSize=2,
+        retryReads=True,
+    )
+    client.admin.command("ping")
+    return client
+
+
+def get_energy_collection():
+    cfg = st.secrets["mongo"]
+    return get_mongo_client()[cfg.get("database", "elhub")][cfg.get("collection", "df_clean")]
+
+
+@st.cache_data(ttl=300, show_spinner=True)
+def load_energy_catalogue() -> pd.DataFrame:
+    """One row per (pricearea, productiongroup) with its first and last UTC hour.
+
+    Everything the pages' selectors need, grouped on the server instead of
+    pulling the whole collection.
+    """
+    pipeline = [
+        {"$match": {"pricearea": {"$ne": None}, "productiongroup": {"$ne": None}}},
+        {"$group": {
+            "_id": {"pricearea": "$pricearea", "productiongroup": "$productiongroup"},
+            "first": {"$min": "$starttime"},
+            "last": {"$max": "$starttime"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "pricearea": "$_id.pricearea",
+            "productiongroup": "$_id.productiongroup",
+            "first": 1,
+            "last": 1,
+        }},
+        {"$sort": {"pricearea": 1, "productiongroup": 1}},
+    ]
+    df = pd.DataFrame.from_records(
+        list(get_energy_collection().aggregate(pipeline)),
+        columns=["pricearea", "productiongroup", "first", "last"],
+    )
+    for c in ("first", "last"):
+        df[c] = df[c].astype("datetime64[ns]").dt.tz_localize("UTC")
+    return df
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_area_hourly(area: str, group: str = "All") -> pd.Series:
+    """Hourly kWh total for one price area (one group, or "All"), cached per selection.
+
+    Filtered and summed per hour in MongoDB, so one row per hour is
+    transferred instead of one per group and hour.
+    """
+    match = {"pricearea": area}
+    if group != "All":
+        match["productiongroup"] = group
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$starttime", "unit": "hour"}},
+            "quantitykwh": {"$sum": "$quantitykwh"},
+        }},
+        {"$project": {"_id": 0, "starttime": "$_id", "quantitykwh": 1}},
+        {"$sort": {"starttime": 1}},
+    ]
+    df = aggregate_arrow_all(
+        get_energy_collection(), pipeline, schema=HOURLY_SCHEMA, allowDiskUse=True
+    ).to_pandas()
+    df = df.dropna()
+    df["starttime"] = df["starttime"].dt.tz_localize("UTC")
+    # Already sorted; resample only inserts zero rows for missing hours
+    return df.set_index("starttime")["quantitykwh"].resample("h").sum()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_area_daily(area: str, group: str = "All") -> pd.Series:
+    """Daily kWh totals for one selection, rebinned once from the cached hourly series."""
+    return load_area_hourly(area, group).resample("D").sum()
+
+
+# ---------------------------------------------------------
+# Chart helpers
+# ---------------------------------------------------------
+PLOT_MAX_POINTS = 5000
+
+
+def thin_for_display(obj, npts: int = PLOT_MAX_POINTS, how: str = "mean"):
+    """Time-bucket aggregate of a time-indexed Series/DataFrame, at most ~npts rows.
+
+    For charts only: the browser gets a bounded payload however long the
+    selected range is. Use how="max" for spiky series so peaks survive.
+    """
+    if len(obj) <= npts:
+        return obj
+    bucket = ((obj.index[-1] - obj.index[0]) / npts).ceil("h")
+    return obj.resample(bucket).agg(how).dropna(how="all")
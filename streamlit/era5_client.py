@@ -0,0 +1,93 @@
+import hashlib
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import orjson
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+ERA5_URL = "https://archive-api.open-meteo.com/v1/era5"
+
+# Union of the hourly variables the pages use. Every request asks for all of
+# them, so pages needing different subsets share one download and one cache
+# file per location and range.
+ERA5_VARS = [
+    "temperature_2m",
+    "precipitation",
+    "windspeed_10m",
+    "windgusts_10m",
+    "winddirection_10m",
+]
+
+# One process-wide session: keep-alive reuses the TCP/TLS connection to
+# Open-Meteo across pages and cache misses instead of a handshake per call.
+# Rate limits and transient 5xx are retried with backoff inside the adapter
+# rather than surfacing as a page error.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    ),
+))
+SESSION.headers["Accept-Encoding"] = "gzip"
+
+# Archive responses are immutable once ERA5 has caught up (about five days
+# behind real time), so they are kept on disk across restarts.
+CACHE_DIR = Path(__file__).resolve().parent / "Data" / "cache" / "era5"
+ERA5_LAG_DAYS = 5
+
+
+def _cache_path(lat, lon, start_date, end_date, variables, tz) -> Path:
+    key = f"{lat:.4f}_{lon:.4f}_{start_date}_{end_date}_{tz}_{','.join(variables)}"
+    return CACHE_DIR / f"{hashlib.md5(key.encode()).hexdigest()}.parquet"
+
+
+def fetch_hourly(lat, lon, start_date, end_date, variables, tz="UTC") -> pd.DataFrame:
+    """Hourly ERA5 frame: naive local 'time' plus one float64 column per variable.
+
+    The superset ERA5_VARS (plus any extra requested variable) is fetched
+    and cached; only the requested columns are returned. Served from a zstd
+    Parquet file when the same location and range were fetched before;
+    otherwise fetched and, if the whole range is final, written to disk.
+    """
+    columns = ["time"] + list(variables)
+    variables = ERA5_VARS + [v for v in variables if v not in ERA5_VARS]
+    path = _cache_path(lat, lon, start_date, end_date, variables, tz)
+    if path.exists():
+        return pd.read_parquet(path, columns=columns)
+
+    r = SESSION.get(
+        ERA5_URL,
+        params={
+            "latitude": lat,
+            "longitude": lon,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "hourly": ",".join(variables),
+            "timezone": tz,
+        },
+        timeout=60,
+    )
+    r.raise_for_status()
+    hourly = orjson.loads(r.content).get("hourly", {})
+    df = pd.DataFrame({
+        "time": pd.to_datetime(hourly.get("time", []), format="%Y-%m-%dT%H:%M"),
+        # null (not yet available) hours become NaN
+        **{var: np.asarray(hourly.get(var, []), dtype=np.float64) for var in variables},
+    })
+
+    if date.fromisoformat(str(end_date)) <= date.today() - timedelta(days=ERA5_LAG_DAYS):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df.to_parquet(tmp, compression="zstd", index=False)
+        os.replace(tmp, path)  # atomic: concurrent sessions never read a partial file
+    return df.drop(columns=df.columns.difference(columns))
@@ -2,12 +2,11 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import timedelta
-from pymongo import MongoClient
-import certifi
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 import plotly.graph_objects as go
-import requests
 from sidebar import navigation
+from era5_client import fetch_hourly
+from data_loader import load_energy_catalogue, load_area_hourly, load_area_daily, thin_for_display
 
 # ---------------------------------------------------------
 # Page config
@@ -32,8 +31,6 @@ You can:
 # ---------------------------------------------------------
 # Constants
 # ---------------------------------------------------------
-ERA5_URL = "https://archive-api.open-meteo.com/v1/era5"
-
 METEO_VARS = [
     "temperature_2m",
     "precipitation",
@@ -52,33 +49,18 @@ PRICE_AREAS = {
 # ---------------------------------------------------------
 # Load energy from MongoDB
 # ---------------------------------------------------------
-@st.cache_data(ttl=300, show_spinner=True)
-def load_energy_df() -> pd.DataFrame:
-    cfg = st.secrets["mongo"]
-    client = MongoClient(
-        cfg["uri"],
-        tlsCAFile=certifi.where(),
-        serverSelectionTimeoutMS=8000,
-    )
-    client.admin.command("ping")
-    col = client[cfg.get("database", "elhub")][cfg.get("collection", "df_clean")]
-    df = pd.DataFrame(list(col.find({}, {"_id": 0})))
-    return df
-
 try:
-    df = load_energy_df()
+    catalogue = load_energy_catalogue()
 except Exception as e:
     st.error(f"MongoDB connection failed: {e}")
     st.stop()
 
-if df.empty:
+if catalogue.empty:
     st.error("No energy data available in MongoDB.")
     st.stop()
 
-df["starttime"] = pd.to_datetime(df["starttime"], utc=True, errors="coerce")
-df["quantitykwh"] = pd.to_numeric(df["quantitykwh"], errors="coerce")
-df = df.dropna(subset=["starttime", "quantitykwh"])
-df = df.set_index("starttime").sort_index()
+data_start = catalogue["first"].min().date()
+data_end = catalogue["last"].max().date()
 
 # ---------------------------------------------------------
 # ERA5 loader
@@ -91,21 +73,29 @@ def fetch_era5_hourly(
     end_date: str,
     tz: str = "UTC",
 ) -> pd.DataFrame:
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ",".join(METEO_VARS),
-        "timezone": tz,
-    }
-    r = requests.get(ERA5_URL, params=params, timeout=60)
-    r.raise_for_status()
-    hourly = r.json().get("hourly", {})
-    df_m = pd.DataFrame(hourly)
-    df_m["time"] = pd.to_datetime(df_m["time"], utc=True)
+    df_m = fetch_hourly(lat, lon, start_date, end_date, METEO_VARS, tz=tz)
+    df_m["time"] = df_m["time"].dt.tz_localize(tz)
     return df_m.set_index("time").sort_index()
 
+# ---------------------------------------------------------
+# Model fit (cached)
+# ---------------------------------------------------------
+@st.cache_resource(show_spinner=False, max_entries=8)
+def fit_sarimax(y, exog, order, seasonal_order):
+    """Fitted SARIMAX results, reused while the data and model spec are unchanged.
+
+    Keyed on the series contents (Streamlit hashes the pandas objects), so
+    changing only the horizon re-forecasts without re-estimating.
+    """
+    return SARIMAX(
+        y,
+        order=order,
+        seasonal_order=seasonal_order,
+        exog=exog,
+        enforce_stationarity=False,
+        enforce_invertibility=False,
+    ).fit(disp=False)
+
 # ---------------------------------------------------------
 # UI – TOP CONFIGURATION PANEL (full width)
 # ---------------------------------------------------------
@@ -115,12 +105,12 @@ st.subheader("⚙️ Configuration")
 # ---- Row 1: main selections ----
 c1, c2, c3, c4 = st.columns(4)
 with c1:
-    price_area = st.selectbox("Price area", sorted(df["pricearea"].dropna().unique()))
+    price_area = st.selectbox("Price area", catalogue["pricearea"].unique())
 
 with c2:
     group = st.selectbox(
         "Production group",
-        ["All"] + sorted(df["productiongroup"].dropna().unique()),
+        ["All"] + sorted(catalogue["productiongroup"].unique()),
     )
 
 with c3:
@@ -156,9 +146,9 @@ st.markdown("---")
 st.markdown("### Training interval")
 train_start, train_end = st.date_input(
     "Training period",
-    value=(df.index.min().date(), df.index.max().date()),
-    min_value=df.index.min().date(),
-    max_value=df.index.max().date(),
+    value=(data_start, data_end),
+    min_value=data_start,
+    max_value=data_end,
 )
 
 st.markdown("---")
@@ -187,21 +177,23 @@ if not run_btn:
 # ---------------------------------------------------------
 # Build energy series
 # ---------------------------------------------------------
-series = df[df["pricearea"] == price_area].copy()
-if group != "All":
-    series = series[series["productiongroup"] == group]
+# Both tables are cached per selection, so a Run only slices them
+if freq == "Hourly":
+    series = load_area_hourly(price_area, group)
+else:
+    series = load_area_daily(price_area, group)
 
 if series.empty:
     with right:
         st.error("No energy data after filtering by price area and group.")
     st.stop()
 
-if freq == "Hourly":
-    y = series["quantitykwh"].resample("H").sum()
-else:
-    y = series["quantitykwh"].resample("D").sum()
-
-y = y.loc[str(train_start):str(train_end)].dropna()
+# Whole days [train_start, train_end] via binary search on the sorted index
+i0, i1 = series.index.searchsorted([
+    pd.Timestamp(train_start, tz="UTC"),
+    pd.Timestamp(train_end, tz="UTC") + pd.Timedelta(days=1),
+])
+y = series.iloc[i0:i1].dropna()
 
 if not run_btn:
     with right:
@@ -283,9 +275,10 @@ if use_exog and exog_vars:
             tz="UTC",
         )
 
-    last_exog = exog_train.iloc[-1]
+    # One contiguous (horizon, n_vars) block repeating the last exog row
+    last_exog = exog_train.to_numpy()[-1:]
     exog_forecast = pd.DataFrame(
-        [last_exog.values] * int(horizon),
+        np.repeat(last_exog, int(horizon), axis=0),
         index=future_index,
         columns=exog_train.columns,
     )
@@ -298,14 +291,7 @@ with st.spinner("Fitting SARIMAX model…"):
     seasonal_order = (int(P), int(D), int(Q), int(s)) if s > 0 else (0, 0, 0, 0)
 
     try:
-        model = SARIMAX(
-            y,
-            order=order,
-            seasonal_order=seasonal_order,
-            exog=exog_train,
-            enforce_stationarity=False,
-            enforce_invertibility=False,
-        ).fit(disp=False)
+        model = fit_sarimax(y, exog_train, order, seasonal_order)
     except Exception as e:
         st.error(f"Model fitting failed: {e}")
         st.stop()
@@ -318,8 +304,11 @@ with st.spinner("Forecasting future steps…"):
         steps=int(horizon),
         exog=exog_forecast if (use_exog and exog_vars) else None,
     )
+    # Plain arrays, extracted once for both forecast traces
     forecast = forecast_res.predicted_mean
-    ci = forecast_res.conf_int()
+    fidx = forecast.index
+    fvals = forecast.to_numpy()
+    lo, hi = forecast_res.conf_int().to_numpy().T
 
 # ---------------------------------------------------------
 # RESULTS (full width under configuration)
@@ -344,20 +333,23 @@ with tab_forecast:
     st.subheader("Forecast")
     fig = go.Figure()
 
+    y_plot = thin_for_display(y)
     fig.add_trace(go.Scatter(
-        x=y.index, y=y, mode="lines",
+        x=y_plot.index, y=y_plot.to_numpy(), mode="lines",
         name="Observed", line=dict(width=2)
     ))
 
     fig.add_trace(go.Scatter(
-        x=forecast.index, y=forecast,
+        x=fidx, y=fvals,
         mode="lines", name="Forecast",
         line=dict(width=2, dash="dash")
     ))
 
+    # Closed band polygon: lower bound forward, upper bound back
+    # (DatetimeIndex.append keeps tz-aware times as datetime64, not objects)
     fig.add_trace(go.Scatter(
-        x=forecast.index.tolist() + forecast.index[::-1].tolist(),
-        y=ci.iloc[:, 0].tolist() + ci.iloc[:, 1][::-1].tolist(),
+        x=fidx.append(fidx[::-1]),
+        y=np.concatenate([lo, hi[::-1]]),
         fill="toself", name="Confidence interval",
         opacity=0.25, line=dict(width=0), hoverinfo="skip",
     ))
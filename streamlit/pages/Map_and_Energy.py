@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
+import plotly.graph_objects as go
 import json
+import os
 from pathlib import Path
 from sidebar import navigation
 
@@ -53,13 +55,24 @@ PRICEAREA_TO_GEOID = {
 # ---------------------------------------------------------
 # Data loaders
 # ---------------------------------------------------------
+def _gold_path(kind: str) -> Path:
+    return PROD_GROUP_PATH if kind == "production" else CONS_GROUP_PATH
+
+
+def data_version(kind: str) -> int:
+    """Modification time of the Gold CSV (0 if missing).
+
+    Passed into the cached loaders and the view fingerprint, so replacing
+    the CSV invalidates every cached layer instead of only some of them.
+    """
+    path = _gold_path(kind)
+    return path.stat().st_mtime_ns if path.exists() else 0
+
+
 @st.cache_data(show_spinner=True)
-def load_gold_daily(kind: str) -> pd.DataFrame:
+def load_gold_daily(kind: str, version: int = 0) -> pd.DataFrame:
     """Load Gold daily-by-group data for production or consumption."""
-    if kind == "production":
-        path = PROD_GROUP_PATH
-    else:
-        path = CONS_GROUP_PATH
+    path = _gold_path(kind)
 
     if not path.exists():
         raise FileNotFoundError(
@@ -67,20 +80,89 @@ def load_gold_daily(kind: str) -> pd.DataFrame:
             "Please ensure the Gold CSV files are placed in streamlit/Data/gold/."
         )
 
-    df = pd.read_csv(path, parse_dates=["date"])
-
-    df["priceArea"] = df["priceArea"].astype(str).str.upper()
-    if kind == "production":
-        df["group"] = df["productionGroup"].astype(str).str.upper()
-    else:
-        df["group"] = df["consumptionGroup"].astype(str).str.upper()
+    # Typed Parquet sidecar holding only the normalized columns the page
+    # uses (labels stored dictionary-encoded), rewritten when the CSV is newer
+    parquet_path = path.with_suffix(".map.parquet")
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= path.stat().st_mtime:
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+
+    raw = pd.read_csv(path, engine="pyarrow", parse_dates=["date"])
+    group_col = "productionGroup" if kind == "production" else "consumptionGroup"
+    df = pd.DataFrame({
+        "date": raw["date"],
+        "priceArea": raw["priceArea"].astype(str).str.upper().astype("category"),
+        "group": raw[group_col].astype(str).str.upper().astype("category"),
+        "quantityKwh_sum": raw["quantityKwh_sum"],
+    })
+    tmp = parquet_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp, engine="pyarrow", compression="zstd", index=False)
+        os.replace(tmp, parquet_path)  # atomic: readers never see a partial file
+    except OSError:
+        pass  # read-only deploy: the in-memory frame is all the page needs
+    finally:
+        tmp.unlink(missing_ok=True)
 
     return df
 
 
-@st.cache_data(show_spinner=True)
+def _round_coords(coords, ndigits: int = 3):
+    """Round nested GeoJSON coordinate lists (~100 m at 3 decimals).
+
+    Consecutive vertices that rounding makes identical are dropped, which
+    thins the detailed coastline rings considerably.
+    """
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, ndigits) for c in coords]
+    if coords and isinstance(coords[0][0], (int, float)):
+        ring = []
+        for pt in coords:
+            pt = _round_coords(pt, ndigits)
+            if not ring or pt != ring[-1]:
+                ring.append(pt)
+        # Keep a valid closed ring even for tiny islets
+        return ring if len(ring) >= 4 else [_round_coords(pt, ndigits) for pt in coords]
+    return [_round_coords(c, ndigits) for c in coords]
+
+
+# One cube per dataset; a superseded version is evicted rather than kept
+@st.cache_resource(show_spinner=False, max_entries=2)
+def build_cube(kind: str, version: int = 0):
+    """Prefix sums over the (group, priceArea, date) daily kWh cube.
+
+    Built once per dataset. Each array has a leading zero along the date axis,
+    so any date window's sum (or count of present days) is two lookups and a
+    subtraction instead of a groupby on every filter change.
+    """
+    df = load_gold_daily(kind, version)
+    pivot = df.pivot_table(
+        index=["group", "priceArea"], columns="date",
+        values="quantityKwh_sum", aggfunc="mean", observed=True,
+    )
+    groups = pd.Index(sorted(df["group"].unique()))
+    areas = pd.Index(sorted(df["priceArea"].unique()))
+    pivot = pivot.reindex(pd.MultiIndex.from_product([groups, areas]))
+    cube = pivot.to_numpy(dtype=float).reshape(len(groups), len(areas), -1)
+    present = ~np.isnan(cube)
+
+    def prefix(a):
+        out = np.zeros(a.shape[:-1] + (a.shape[-1] + 1,))
+        np.cumsum(a, axis=-1, out=out[..., 1:])
+        return out
+
+    kwh_cum = prefix(np.where(present, cube, 0.0))   # (group, area, date + 1)
+    area_days_cum = prefix(present)                  # days with data per area
+    days_cum = prefix(present.any(axis=1))           # days with data in any area
+    return groups, areas, pivot.columns.to_numpy(), kwh_cum, area_days_cum, days_cum
+
+
+@st.cache_resource(show_spinner=True)
 def load_geojson():
-    """Load price-area GeoJSON and return it together with the ID field."""
+    """Load price-area GeoJSON with rounded coordinates and a per-area overlay by ID.
+
+    Cached as a resource (shared, read-only) so the large dict is not
+    re-pickled on every rerun.
+    """
     if not GEOJSON_PATH.exists():
         raise FileNotFoundError(
             f"GeoJSON not found: {GEOJSON_PATH}\n"
@@ -99,15 +181,24 @@ def load_geojson():
             f"Available properties: {list(props.keys())}"
         )
 
-    geo_ids = sorted({feat["properties"][id_field] for feat in gj["features"]})
-    return gj, id_field, geo_ids
+    for feat in gj["features"]:
+        geom = feat["geometry"]
+        geom["coordinates"] = _round_coords(geom["coordinates"])
+
+    # One-feature collections for the highlight overlay, built once
+    area_fc = {
+        feat["properties"][id_field]: {"type": "FeatureCollection", "features": [feat]}
+        for feat in gj["features"]
+    }
+    geo_ids = sorted(area_fc)
+    return gj, id_field, geo_ids, area_fc
 
 
 # ---------------------------------------------------------
 # Load data with error handling
 # ---------------------------------------------------------
 try:
-    geojson, id_field, geo_ids = load_geojson()
+    geojson, id_field, geo_ids, area_fc = load_geojson()
 except Exception as e:
     st.error(f"Could not load GeoJSON data.\n\n**Details:** {e}")
     st.stop()
@@ -120,8 +211,9 @@ kind = st.radio(
 )
 kind_key = "production" if kind == "Production" else "consumption"
 
+version = data_version(kind_key)
 try:
-    df = load_gold_daily(kind_key)
+    df = load_gold_daily(kind_key, version)
 except Exception as e:
     st.error(f"Could not load the selected dataset.\n\n**Details:** {e}")
     st.stop()
@@ -175,64 +267,71 @@ with right:
 # ---------------------------------------------------------
 # Filter + aggregate
 # ---------------------------------------------------------
-mask = (
-    (df["group"] == sel_group) &
-    (df["date"].dt.date >= start_date) &
-    (df["date"].dt.date <= end_date)
-)
-filt = df.loc[mask].copy()
-
-if filt.empty:
-    st.warning("No data available for this combination of filters.")
-    st.stop()
-
-agg = (
-    filt.groupby("priceArea", as_index=False)["quantityKwh_sum"]
-        .mean()
-        .rename(columns={"quantityKwh_sum": "mean_quantity"})
-)
-
-agg["geo_id"] = agg["priceArea"].map(PRICEAREA_TO_GEOID)
-
-st.caption(f"Average calculated over **{len(filt['date'].unique())}** day(s).")
-
-# ---------------------------------------------------------
-# Map
-# ---------------------------------------------------------
-with left:
-    st.subheader("Map of price areas")
-
+# Everything below the filters depends only on these values; reruns from
+# unrelated widgets (e.g. the coordinate inputs) reuse the last figure
+clicked = st.session_state.get("clicked_coord")
+fingerprint = (kind_key, version, sel_group, start_date, end_date, highlight_area, clicked)
+last_view = st.session_state.get("map_view")
+
+if last_view is not None and last_view[0] == fingerprint:
+    _, agg, n_days, fig = last_view
+else:
+    # Native datetime64 bounds: no per-row datetime.date objects
+    start_ts = np.datetime64(start_date)
+    end_ts = np.datetime64(end_date) + np.timedelta64(1, "D")
+
+    cube_groups, cube_areas, cube_dates, kwh_cum, area_days_cum, days_cum = build_cube(kind_key, version)
+    # Window [i0, i1) on the date axis; every total is prefix[i1] - prefix[i0]
+    i0, i1 = np.searchsorted(cube_dates, [start_ts, end_ts])
+    g = cube_groups.get_loc(sel_group)
+    n_days = int(days_cum[g, i1] - days_cum[g, i0])
+
+    if n_days == 0:
+        st.warning("No data available for this combination of filters.")
+        st.stop()
+
+    counts = area_days_cum[g, :, i1] - area_days_cum[g, :, i0]
+    sums = kwh_cum[g, :, i1] - kwh_cum[g, :, i0]
+    has_data = counts > 0
+    areas = cube_areas[has_data]
+    agg = pd.DataFrame({
+        "priceArea": areas,
+        "mean_quantity": sums[has_data] / counts[has_data],
+        "geo_id": [PRICEAREA_TO_GEOID.get(a) for a in areas],
+    })
+
+    # ---- Map figure ----
     zmax = agg["mean_quantity"].max()
 
-    fig = px.choropleth_mapbox(
-        agg,
+    # WebGL mapbox trace built directly (no Express argument processing)
+    fig = go.Figure(go.Choroplethmapbox(
         geojson=geojson,
-        locations="geo_id",
+        locations=agg["geo_id"].to_numpy(),
         featureidkey=f"properties.{id_field}",
-        color="mean_quantity",
-        color_continuous_scale="Viridis",
-        range_color=(0, zmax),
+        z=agg["mean_quantity"].to_numpy(),
+        colorscale="Viridis",
+        zmin=0,
+        zmax=zmax,
+        marker_opacity=0.5,
+        text=agg["priceArea"].astype(str).to_numpy(),
+        hovertemplate="<b>%{text}</b><br>Mean kWh: %{z:,.0f}<extra></extra>",
+        colorbar_title="Mean kWh (avg over period)",
+    ))
+    fig.update_layout(
         mapbox_style="carto-positron",
-        zoom=3.7,
-        center={"lat": 64.5, "lon": 12.0},
-        opacity=0.5,
-        hover_name="priceArea",
-        labels={"mean_quantity": "Mean kWh (avg over period)"},
+        mapbox_zoom=3.7,
+        mapbox_center={"lat": 64.5, "lon": 12.0},
     )
 
     # Highlight selected area with red overlay
     if highlight_area != "None":
-        hi = agg[agg["priceArea"] == highlight_area].copy()
+        hi = agg[agg["priceArea"] == highlight_area]
         if not hi.empty:
             highlight_id = hi["geo_id"].iloc[0]
 
-            hi_geojson = {
-                "type": "FeatureCollection",
-                "features": [
-                    feat for feat in geojson["features"]
-                    if feat["properties"][id_field] == highlight_id
-                ],
-            }
+            hi_geojson = area_fc.get(
+                highlight_id, {"type": "FeatureCollection", "features": []}
+            )
 
             fig.add_choroplethmapbox(
                 geojson=hi_geojson,
@@ -251,7 +350,6 @@ with left:
             )
 
     # Add a marker for stored coordinates
-    clicked = st.session_state.get("clicked_coord")
     if clicked is not None:
         lat, lon = clicked
         fig.add_scattermapbox(
@@ -262,6 +360,15 @@ with left:
             name="Selected point",
         )
 
+    st.session_state["map_view"] = (fingerprint, agg, n_days, fig)
+
+st.caption(f"Average calculated over **{n_days}** day(s).")
+
+# ---------------------------------------------------------
+# Map
+# ---------------------------------------------------------
+with left:
+    st.subheader("Map of price areas")
     st.plotly_chart(fig, use_container_width=True)
 
 # ---------------------------------------------------------
@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-from pathlib import Path
+import numpy as np
 from sidebar import navigation
+from data_loader import get_meteo_df, thin_for_display
 
 # ---------------------------------------------------------
 # Page Setup
@@ -22,22 +22,48 @@ You can:
 """)
 
 # ---------------------------------------------------------
-# Load Data
-# ---------------------------------------------------------
-@st.cache_data
-def load_data() -> pd.DataFrame:
-    csv_path = Path(__file__).resolve().parents[1] / "Data" / "open_meteo_clean.csv"
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV not found at: {csv_path}")
-
-    df = pd.read_csv(csv_path)
-    if "time" in df.columns:
-        df["time"] = pd.to_datetime(df["time"], errors="coerce", utc=True)
-    return df
+# Chart Helpers
+# ---------------------------------------------------------
+def downsample(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    """'time' plus cols, thinned to the shared chart point cap."""
+    return thin_for_display(df.set_index("time")[cols]).reset_index()
+
+
+def line_spec(title: dict, y_title: str, fold: list = None) -> dict:
+    """Minimal Vega-Lite line spec; the data is sent separately as Arrow.
+
+    With ``fold``, the wide columns are reshaped to Variable/Value rows in
+    the browser, so no long-format copy is built in Python.
+    """
+    encoding = {
+        "x": {"field": "time", "type": "temporal", "title": "Time"},
+        "y": {"field": "Value", "type": "quantitative", "title": y_title},
+        "tooltip": [
+            {"field": "time", "type": "temporal"},
+            {"field": "Value", "type": "quantitative"},
+        ],
+    }
+    if fold:
+        encoding["color"] = {"field": "Variable", "type": "nominal", "title": "Variable"}
+        encoding["tooltip"].insert(1, {"field": "Variable", "type": "nominal"})
+    spec = {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": title,
+        "mark": {"type": "line", "point": False},
+        "encoding": encoding,
+        # Scale-bound interval = zoom/pan, like Altair's .interactive()
+        "params": [{"name": "grid", "select": "interval", "bind": "scales"}],
+    }
+    if fold:
+        spec["transform"] = [{"fold": fold, "as": ["Variable", "Value"]}]
+    return spec
 
 
+# ---------------------------------------------------------
+# Load Data
+# ---------------------------------------------------------
 try:
-    data = load_data()
+    data = get_meteo_df()
 except Exception as e:
     st.error(f"❌ Failed to load data:\n\n{e}")
     st.stop()
@@ -55,9 +81,15 @@ if not numeric_cols:
     st.warning("⚠️ No numeric meteorological variables found to plot.")
     st.stop()
 
-data["month"] = data["time"].dt.to_period("M")
-months = sorted(data["month"].dropna().unique().tolist())
-month_labels = [str(m) for m in months]
+# Integer month keys (year*12 + month-1) so the range filter is an int compare
+time_ns = data["time"].values
+ym = time_ns.astype("datetime64[M]").astype(np.int64) + 1970 * 12
+month_keys = np.unique(ym[~np.isnat(time_ns)]).tolist()
+
+
+def month_label(key: int) -> str:
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
 
 # ---------------------------------------------------------
 # UI: Configuration
@@ -77,21 +109,21 @@ st.markdown("### Month range")
 
 col_left, col_slider, col_right = st.columns([1, 6, 1])
 with col_slider:
-    start_label, end_label = st.select_slider(
+    start_key, end_key = st.select_slider(
         label="Select month range",
-        options=month_labels,
-        value=(month_labels[0], month_labels[-1]),
+        options=month_keys,
+        value=(month_keys[0], month_keys[-1]),
+        format_func=month_label,
     )
+start_label, end_label = month_label(start_key), month_label(end_key)
 
 st.markdown("---")
 
 # ---------------------------------------------------------
 # Filter Data
 # ---------------------------------------------------------
-start_period = pd.Period(start_label, freq="M")
-end_period = pd.Period(end_label, freq="M")
-mask = data["month"].between(start_period, end_period)
-df = data.loc[mask].copy()
+mask = (ym >= start_key) & (ym <= end_key)
+df = data.loc[mask]  # boolean .loc already returns a new frame
 
 # ---------------------------------------------------------
 # Summary row
@@ -111,48 +143,24 @@ title_text = (
 subtitle_text = f"{start_label} → {end_label}"
 
 if col_choice == "All variables":
-
-    plot_df = df.melt(
-        id_vars=["time"],
-        value_vars=numeric_cols,
-        var_name="Variable",
-        value_name="Value"
-    )
-
-    chart = (
-        alt.Chart(plot_df)
-        .mark_line()
-        .encode(
-            x=alt.X("time:T", title="Time"),
-            y=alt.Y("Value:Q", title="Value"),
-            color=alt.Color("Variable:N", title="Variable"),
-            tooltip=["time:T", "Variable:N", "Value:Q"],
-        )
-        .properties(title={"text": title_text, "subtitle": subtitle_text})
-        .interactive()
-    )
-
+    # Wide frame as-is; the spec's fold transform does the reshape
+    plot_df = downsample(df, numeric_cols)
+    y_title = "Value"
 else:
+    plot_df = downsample(df, [col_choice]).rename(columns={col_choice: "Value"})
+    y_title = col_choice
 
-    plot_df = df[["time", col_choice]].rename(columns={col_choice: "Value"})
-
-    chart = (
-        alt.Chart(plot_df)
-        .mark_line()
-        .encode(
-            x=alt.X("time:T", title="Time"),
-            y=alt.Y("Value:Q", title=col_choice),
-            tooltip=["time:T", "Value:Q"],
-        )
-        .properties(title={"text": title_text, "subtitle": subtitle_text})
-        .interactive()
-    )
+spec = line_spec(
+    {"text": title_text, "subtitle": subtitle_text},
+    y_title,
+    fold=numeric_cols if col_choice == "All variables" else None,
+)
 
 # ---------------------------------------------------------
 # Display Plot
 # ---------------------------------------------------------
 st.subheader("📈 Trend Plot")
-st.altair_chart(chart, use_container_width=True)
+st.vega_lite_chart(plot_df, spec, use_container_width=True)
 
 # ---------------------------------------------------------
 # Data Preview
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
+import numpy as np
 from sidebar import navigation
+from data_loader import get_meteo_df, get_meteo_first_month
 
 
 # ---------------------------------------------------------
@@ -24,28 +25,34 @@ Use this page to quickly inspect:
 """)
 
 # ---------------------------------------------------------
-# Data Loader
+# Overview Table Builder
 # ---------------------------------------------------------
-@st.cache_data
-def load_data() -> pd.DataFrame:
-    csv_path = Path(__file__).resolve().parents[1] / "Data" / "open_meteo_clean.csv"
-    if not csv_path.exists():
-        raise FileNotFoundError(f"CSV not found at: {csv_path}")
+@st.cache_resource(show_spinner=False)
+def build_overview_table():
+    """Sparkline table of the first month plus its shared y-range, built once per process.
 
-    df = pd.read_csv(csv_path)
-
-    # Normalize datetime column
-    if "time" in df.columns:
-        df["time"] = pd.to_datetime(df["time"], errors="coerce", utc=True)
-
-    return df
+    Like the first-month frame it comes from, the result is shared between
+    sessions and must not be mutated.
+    """
+    first_month = get_meteo_first_month()
+    numeric_cols = first_month.select_dtypes(include="number").columns.tolist()
+    if not numeric_cols:
+        return pd.DataFrame(columns=["Series", "First Month Trend"]), None, None
 
+    # One 2-D array: a single transpose gives every sparkline list at once
+    arr = first_month[numeric_cols].to_numpy(dtype=float)
+    reshaped = pd.DataFrame({
+        "Series": numeric_cols,
+        "First Month Trend": arr.T.tolist(),
+    })
+    # Shared scale for consistent sparkline charts
+    return reshaped, float(np.nanmin(arr)), float(np.nanmax(arr))
 
 # ---------------------------------------------------------
 # Load Data
 # ---------------------------------------------------------
 try:
-    data = load_data()
+    first_month = get_meteo_first_month()
 except Exception as e:
     st.error(f"❌ Failed to load meteorology data:\n\n{e}")
     st.stop()
@@ -54,49 +61,38 @@ except Exception as e:
 # Raw Data Viewer
 # ---------------------------------------------------------
 with st.expander("📄 View raw imported data"):
-    st.dataframe(data, use_container_width=True)
+    # The overview only needs the first month; read everything on demand
+    if st.toggle("Load the full dataset", value=False):
+        st.dataframe(get_meteo_df(), use_container_width=True)
+    else:
+        st.dataframe(first_month, use_container_width=True)
 
 # ---------------------------------------------------------
 # Validate time column
 # ---------------------------------------------------------
-if "time" not in data.columns or not pd.api.types.is_datetime64_any_dtype(data["time"]):
+if "time" not in first_month.columns or not pd.api.types.is_datetime64_any_dtype(first_month["time"]):
     st.error("❌ The dataset does not contain a valid 'time' column.")
     st.stop()
 
 # ---------------------------------------------------------
 # Extract First Month
 # ---------------------------------------------------------
-first_ts = data["time"].min()
-month_mask = (
-    (data["time"].dt.year == first_ts.year) &
-    (data["time"].dt.month == first_ts.month)
-)
-first_month = data.loc[month_mask].copy()
-
 if first_month.empty:
     st.warning("⚠️ No data found for the first month of the dataset.")
     st.stop()
 
+first_ts = first_month["time"].min()
 st.markdown(f"### 📅 First Month Extracted: **{first_ts.strftime('%B %Y')}**")
 
 # ---------------------------------------------------------
 # Build Overview Table w/ Inline Line Charts
 # ---------------------------------------------------------
-numeric_cols = first_month.select_dtypes(include="number").columns.tolist()
+reshaped, y_min, y_max = build_overview_table()
 
-if not numeric_cols:
+if reshaped.empty:
     st.warning("⚠️ No numeric meteorological variables found.")
     st.stop()
 
-reshaped = pd.DataFrame({
-    "Series": numeric_cols,
-    "First Month Trend": [first_month[col].tolist() for col in numeric_cols],
-})
-
-# Shared scale for consistent sparkline charts
-y_min = first_month[numeric_cols].min().min()
-y_max = first_month[numeric_cols].max().max()
-
 # ---------------------------------------------------------
 # Final Overview Table
 # ---------------------------------------------------------
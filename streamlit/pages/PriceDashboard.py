@@ -1,13 +1,11 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from pymongo import MongoClient
-import certifi
+import plotly.graph_objects as go
 from sidebar import navigation
+from data_loader import get_energy_collection
 
 # ---------------------- Page Config ----------------------
 st.set_page_config(page_title="Price Dashboard", layout="wide")
-px.defaults.template = "plotly_dark"
 
 navigation()
 
@@ -17,37 +15,201 @@ st.caption("Hourly production per group and price area (MongoDB-backed)")
 
 
 # ---------------------- Load Data ------------------------
-@st.cache_data(ttl=300, show_spinner=True)
-def load_df_from_mongo() -> pd.DataFrame:
-    cfg = st.secrets["mongo"]
-    client = MongoClient(cfg["uri"], tlsCAFile=certifi.where(), serverSelectionTimeoutMS=8000)
-    client.admin.command("ping")
-    col = client[cfg.get("database", "elhub")][cfg.get("collection", "df_clean")]
-    df = pd.DataFrame(list(col.find({}, {"_id": 0})))
-    return df
-
-with st.spinner("Loading data from MongoDB…"):
-    df = load_df_from_mongo()
-
-if df.empty:
-    st.error("No data in MongoDB collection.")
-    st.stop()
+MONTH_NAMES = {
+    1:"January", 2:"February", 3:"March", 4:"April", 5:"May", 6:"June",
+    7:"July", 8:"August", 9:"September", 10:"October", 11:"November", 12:"December"
+}
+
+
+def get_collection():
+    # Same pooled client as the other Mongo-backed pages
+    return get_energy_collection()
+
 
-# ------------ Data Cleanup -------------------------------
-df = df.copy()
-expected = {"pricearea", "productiongroup", "starttime", "quantitykwh"}
-missing = expected - set(df.columns)
-if missing:
-    st.error(f"Missing required columns in Mongo: {sorted(missing)}")
+# Only the fields the pipelines need, so the $match output stays small
+_PROJECT = {"$project": {"_id": 0, "productiongroup": 1, "starttime": 1, "quantitykwh": 1}}
+
+
+def _selection(month: int = 0, groups: tuple = ()) -> dict:
+    """Filter for one month (0 = all) and a set of groups (empty = all)."""
+    match = {}
+    if groups:
+        match["productiongroup"] = {"$in": list(groups)}
+    if month:
+        # $expr is evaluated per document (no index can serve $month); it only
+        # runs on the rows left after the area match
+        match["$expr"] = {"$eq": [{"$month": "$starttime"}, month]}
+    return match
+
+
+def _match_stage(area: str, month: int = 0, groups: tuple = ()) -> dict:
+    """$match for one price area, optionally one month and a set of groups."""
+    return {"$match": {"pricearea": area, **_selection(month, groups)}}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def categories():
+    """Distinct price areas and production groups (invariant between reruns)."""
+    col = get_collection()
+    areas = sorted(a for a in col.distinct("pricearea") if a)
+    groups = sorted(g for g in col.distinct("productiongroup") if g)
+    return areas, groups
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_catalogue() -> pd.MultiIndex:
+    """Every (price area, month, group) present, as one sorted MultiIndex.
+
+    Built once per TTL; month and group options are then sliced out with
+    get_loc (a binary search on the sorted index) instead of a query per pick.
+    """
+    pipeline = [
+        {"$group": {"_id": {
+            "pricearea": "$pricearea",
+            "month": {"$month": "$starttime"},
+            "productiongroup": "$productiongroup",
+        }}},
+        {"$replaceWith": "$_id"},
+    ]
+    df = pd.DataFrame.from_records(
+        # One batch: the catalogue is a few hundred tiny documents
+        list(get_collection().aggregate(pipeline, batchSize=10_000)),
+        columns=["pricearea", "month", "productiongroup"],
+    ).dropna()
+    df["month"] = df["month"].astype(int)
+    return pd.MultiIndex.from_frame(df).sort_values()
+
+
+def load_months(area: str) -> list:
+    catalogue = load_catalogue()
+    if area not in catalogue:
+        return []
+    sub = catalogue[catalogue.get_loc(area)]
+    return sorted(set(sub.get_level_values("month")))
+
+
+def load_groups(area: str, month: int) -> list:
+    catalogue = load_catalogue()
+    key = (area, month) if month else area
+    if key not in catalogue:
+        return []
+    sub = catalogue[catalogue.get_loc(key)]
+    return sorted(set(sub.get_level_values("productiongroup")))
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_all(area: str, month: int, groups: tuple):
+    """Pie, line and KPI data for one selection in a single round trip.
+
+    The area partition is matched (and scanned) once; $facet then builds the
+    area-wide pie plus the month/group-filtered line. The KPIs are derived
+    from the line rows rather than grouped a second time.
+    """
+    selection = [{"$match": _selection(month, groups)}]
+    pipeline = [
+        _match_stage(area),
+        _PROJECT,
+        {"$facet": {
+            "pie": [
+                {"$group": {"_id": "$productiongroup", "quantitykwh": {"$sum": "$quantitykwh"}}},
+                {"$sort": {"quantitykwh": -1}},
+                {"$project": {"_id": 0, "productiongroup": "$_id", "quantitykwh": 1}},
+            ],
+            "line": selection + [
+                {"$group": {
+                    "_id": {"starttime": "$starttime", "productiongroup": "$productiongroup"},
+                    "quantitykwh": {"$sum": "$quantitykwh"},
+                }},
+                {"$sort": {"_id.starttime": 1}},
+                {"$project": {
+                    "_id": 0,
+                    "starttime": "$_id.starttime",
+                    "productiongroup": "$_id.productiongroup",
+                    "quantitykwh": 1,
+                }},
+            ],
+        }},
+    ]
+    res = next(get_collection().aggregate(pipeline, allowDiskUse=True))
+
+    # Rows arrive flat from $project, so each frame is built in one
+    # from_records pass (BSON dates decode straight to datetime64)
+    pie_data = pd.DataFrame.from_records(res["pie"], columns=["productiongroup", "quantitykwh"])
+    line_data = pd.DataFrame.from_records(
+        res["line"], columns=["starttime", "productiongroup", "quantitykwh"]
+    )
+    line_data["starttime"] = line_data["starttime"].astype("datetime64[ns]").dt.tz_localize("UTC")
+    stats = {
+        "rows": len(line_data),
+        "total": float(line_data["quantitykwh"].sum()),
+        "mn": line_data["starttime"].min() if len(line_data) else None,
+        "mx": line_data["starttime"].max() if len(line_data) else None,
+    }
+    # Compact cached form: float32 values and integer-coded group labels
+    line_data["quantitykwh"] = line_data["quantitykwh"].astype("float32")
+    # Categories come from the rows themselves, so a group newer than the
+    # (longer-lived) categories() cache is kept rather than turned into NaN
+    line_data["productiongroup"] = line_data["productiongroup"].astype("category")
+    return pie_data, line_data, stats
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def build_figures(area: str, month: int, groups: tuple):
+    """Pie and line figure specs (plain dicts) plus KPIs for one selection.
+
+    Revisiting a selection skips the trace building; the cache holds
+    fig.to_dict() rather than pickling Figure objects.
+    """
+    pie_data, line_data, stats = fetch_all(area, month, groups)
+
+    pie_spec = None
+    if not pie_data.empty:
+        fig = go.Figure(go.Pie(
+            labels=pie_data["productiongroup"].to_numpy(),
+            values=pie_data["quantitykwh"].to_numpy(),
+            textinfo="percent+label",
+            pull=0.02,
+        ))
+        fig.update_layout(template="plotly_dark", uirevision=area)
+        pie_spec = fig.to_dict()
+
+    line_spec = None
+    if not line_data.empty:
+        # One trace per group straight from NumPy arrays (no Express inference)
+        fig = go.Figure()
+        for g, sub in line_data.groupby("productiongroup", observed=True):
+            fig.add_scatter(
+                x=sub["starttime"].dt.tz_convert(None).to_numpy(),
+                y=sub["quantitykwh"].to_numpy(),
+                mode="lines",
+                name=g,
+            )
+        fig.update_layout(
+            template="plotly_dark",
+            title=f"Hourly production — {area} — {MONTH_NAMES.get(month, 'All months')}",
+            xaxis_title="starttime",
+            yaxis_title="quantitykwh",
+            legend_title="productiongroup",
+            uirevision=area,  # keep zoom/legend state while filters change
+        )
+        line_spec = fig.to_dict()
+
+    return pie_spec, line_spec, stats
+
+
+try:
+    with st.spinner("Loading data from MongoDB…"):
+        price_areas, _ = categories()
+except Exception as e:
+    st.error(f"MongoDB connection failed: {e}")
     st.stop()
 
-df["starttime"] = pd.to_datetime(df["starttime"], utc=True, errors="coerce")
-df["quantitykwh"] = pd.to_numeric(df["quantitykwh"], errors="coerce")
-df = df.dropna(subset=["starttime", "quantitykwh"])
-df["month"] = df["starttime"].dt.month
+if not price_areas:
+    st.error("No data in MongoDB collection.")
+    st.stop()
 
 st.caption(
-    f"Loaded {len(df):,} rows from "
+    f"Aggregated in MongoDB from "
     f"{st.secrets['mongo'].get('database','elhub')}.{st.secrets['mongo'].get('collection','df_clean')}"
 )
 
@@ -60,8 +222,6 @@ with left:
     st.markdown("### Area & Composition")
     st.markdown("<hr>", unsafe_allow_html=True)
 
-    price_areas = sorted(df["pricearea"].dropna().unique())
-
     # Horizontal radio = better UX
     area = st.radio(
         "Select price area",
@@ -72,24 +232,6 @@ with left:
     )
 
     st.session_state["area"] = area
-    area_df = df[df["pricearea"] == area]
-
-    pie_data = (
-        area_df.groupby("productiongroup", as_index=False)["quantitykwh"]
-        .sum()
-        .sort_values("quantitykwh", ascending=False)
-    )
-
-    if pie_data.empty:
-        st.info("No data for selected area.")
-    else:
-        fig = px.pie(
-            pie_data,
-            values="quantitykwh",
-            names="productiongroup",
-        )
-        fig.update_traces(textinfo="percent+label", pull=0.02)
-        st.plotly_chart(fig, use_container_width=True)
 
 
 # ---------------------- RIGHT COLUMN ----------------------
@@ -97,14 +239,9 @@ with right:
     st.markdown("### Groups & Monthly Trend")
     st.markdown("<hr>", unsafe_allow_html=True)
 
-    month_names = {
-        1:"January", 2:"February", 3:"March", 4:"April", 5:"May", 6:"June",
-        7:"July", 8:"August", 9:"September", 10:"October", 11:"November", 12:"December"
-    }
-
-    months_avail = sorted(area_df["month"].dropna().unique().tolist())
+    months_avail = load_months(area)
     month_options = [0] + months_avail
-    month_labels = {0: "All months", **{m: month_names[m] for m in months_avail}}
+    month_labels = {0: "All months", **{m: MONTH_NAMES[m] for m in months_avail}}
 
     default_month_index = 0 if not months_avail else month_options.index(months_avail[-1])
 
@@ -116,9 +253,7 @@ with right:
         key="p4_month",
     )
 
-    filt_df = area_df if sel_month == 0 else area_df[area_df["month"] == sel_month]
-
-    groups_avail = sorted(filt_df["productiongroup"].dropna().unique().tolist())
+    groups_avail = load_groups(area, sel_month)
 
     if hasattr(st, "pills"):
         groups = st.pills("Production group(s)", options=groups_avail,
@@ -127,27 +262,26 @@ with right:
         groups = st.multiselect("Production group(s)", options=groups_avail,
                                 default=groups_avail, key="p4_groups")
 
-    if groups:
-        filt_df = filt_df[filt_df["productiongroup"].isin(groups)]
+# Tuple so the selection is hashable as a cache key; empty = all groups
+sel_groups = tuple(sorted(groups)) if groups else ()
+pie_spec, line_spec, stats = build_figures(area, sel_month, sel_groups)
+
+with left:
+    if pie_spec is None:
+        st.info("No data for selected area.")
+    else:
+        st.plotly_chart(go.Figure(pie_spec), use_container_width=True)
 
-    if filt_df.empty:
+with right:
+    if line_spec is None:
         st.info("No rows for this combination of area, groups, and month.")
     else:
-        line_data = (
-            filt_df.groupby(["starttime", "productiongroup"], as_index=False)["quantitykwh"]
-            .sum()
-            .sort_values("starttime")
-        )
+        st.plotly_chart(go.Figure(line_spec), use_container_width=True)
 
-        title_month = month_labels[sel_month]
-        fig = px.line(
-            line_data,
-            x="starttime",
-            y="quantitykwh",
-            color="productiongroup",
-            title=f"Hourly production — {area} — {title_month}",
+        st.caption(
+            f"{stats['rows']:,} hourly rows · {stats['total']:,.0f} kWh total · "
+            f"{pd.Timestamp(stats['mn']):%Y-%m-%d} → {pd.Timestamp(stats['mx']):%Y-%m-%d}"
         )
-        st.plotly_chart(fig, use_container_width=True)
 
 
 # ---------------------- EXPANDER --------------------------
@@ -1,13 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from pymongo import MongoClient
-import certifi
 from statsmodels.tsa.seasonal import STL
 from scipy.signal import spectrogram
+from scipy.fft import set_workers
 import plotly.graph_objects as go
 import plotly.express as px
 from sidebar import navigation
+from data_loader import load_energy_catalogue, load_area_hourly
 from plotly.subplots import make_subplots
 
 
@@ -20,31 +20,52 @@ st.title("📊 STL Decomposition & Spectrogram (Energy Series)")
 navigation()
 
 # ---------------------------------------------------------
-# Load data
+# Cached computations
 # ---------------------------------------------------------
-@st.cache_data(ttl=300, show_spinner=True)
-def load_mongo_df() -> pd.DataFrame:
-    cfg = st.secrets["mongo"]
-    client = MongoClient(
-        cfg["uri"],
-        tlsCAFile=certifi.where(),
-        serverSelectionTimeoutMS=8000
-    )
-    client.admin.command("ping")
-    col = client[cfg.get("database", "elhub")][cfg.get("collection", "df_clean")]
-    df = pd.DataFrame(list(col.find({}, {"_id": 0})))
-    return df
+@st.cache_data(ttl=300, show_spinner=False)
+def interpolated_series(area: str, group: str) -> pd.Series:
+    """Gap-filled hourly series for one selection."""
+    return load_area_hourly(area, group).interpolate()
+
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=32)
+def stl_components(area, group, period, seasonal, trend, robust) -> pd.DataFrame:
+    """Trend, seasonal and residual of the STL fit, cached per parameter set.
+
+    Keyed on the small selection/parameter tuple, so revisiting a setting
+    skips the iterative LOESS fit entirely.
+    """
+    res = STL(
+        interpolated_series(area, group),
+        period=period,
+        seasonal=seasonal,
+        trend=trend,
+        robust=robust
+    ).fit()
+    return pd.DataFrame({"trend": res.trend, "seasonal": res.seasonal, "resid": res.resid})
+
+
+HEATMAP_CELLS = 400
+
+
+def bin_mean(a: np.ndarray, axis: int, max_bins: int = HEATMAP_CELLS) -> np.ndarray:
+    """Mean over consecutive blocks along ``axis`` so it has at most ~max_bins entries."""
+    k = max(1, -(-a.shape[axis] // max_bins))
+    if k == 1:
+        return a
+    a = np.moveaxis(a, axis, 0)
+    n = a.shape[0] // k * k
+    out = a[:n].reshape(n // k, k, *a.shape[1:]).mean(axis=1)
+    return np.moveaxis(out, 0, axis)
 
-df = load_mongo_df()
-if df.empty:
+# ---------------------------------------------------------
+# Load data
+# ---------------------------------------------------------
+catalogue = load_energy_catalogue()
+if catalogue.empty:
     st.error("No data available in MongoDB.")
     st.stop()
 
-# Prepare dataframe
-df["starttime"] = pd.to_datetime(df["starttime"], utc=True, errors="coerce")
-df["quantitykwh"] = pd.to_numeric(df["quantitykwh"], errors="coerce")
-df = df.dropna(subset=["starttime", "quantitykwh"])
-
 # ---------------------------------------------------------
 # Configuration panel
 # ---------------------------------------------------------
@@ -53,23 +74,14 @@ st.subheader("⚙️ Configuration")
 col1, col2 = st.columns(2)
 
 with col1:
-    area = st.selectbox("Price area", sorted(df["pricearea"].dropna().unique()))
+    area = st.selectbox("Price area", catalogue["pricearea"].unique())
 with col2:
     group = st.selectbox(
         "Production group (optional)",
-        ["All"] + sorted(df["productiongroup"].dropna().unique())
+        ["All"] + sorted(catalogue["productiongroup"].unique())
     )
 
-series = df[df["pricearea"] == area]
-if group != "All":
-    series = series[series["productiongroup"] == group]
-
-y = (
-    series.set_index("starttime")
-    .sort_index()["quantitykwh"]
-    .resample("H").sum()
-    .interpolate()
-)
+y = interpolated_series(area, group)
 
 # ---------------------------------------------------------
 # Tabs for analysis sections
@@ -96,13 +108,7 @@ with tab_stl:
 
     st.markdown("### 📊 STL Components (split into 4 plots)")
 
-    res = STL(
-        y,
-        period=period,
-        seasonal=seasonal,
-        trend=trend,
-        robust=robust
-    ).fit()
+    res = stl_components(area, group, int(period), int(seasonal), int(trend), bool(robust))
 
     # Build separate subplots using Plotly
     fig = make_subplots(
@@ -111,10 +117,16 @@ with tab_stl:
         subplot_titles=["Observed", "Trend", "Seasonal", "Residual"]
     )
 
-    fig.add_trace(go.Scatter(x=y.index, y=y, name="Observed"), row=1, col=1)
-    fig.add_trace(go.Scatter(x=y.index, y=res.trend, name="Trend"), row=2, col=1)
-    fig.add_trace(go.Scatter(x=y.index, y=res.seasonal, name="Seasonal"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=y.index, y=res.resid, name="Residual"), row=4, col=1)
+    # One naive-UTC datetime64 axis and float32 values shared by all four
+    # traces: typed arrays serialize directly, with no per-trace tz-aware
+    # timestamp formatting and half the bytes per value
+    x = y.index.tz_localize(None).to_numpy()
+    comps = np.column_stack([y.to_numpy(), res.to_numpy()]).astype(np.float32)
+    for row, name in enumerate(["Observed", "Trend", "Seasonal", "Residual"]):
+        fig.add_trace(
+            go.Scatter(x=x, y=comps[:, row], name=name, hovertemplate="%{y:.1f}"),
+            row=row + 1, col=1,
+        )
 
     fig.update_layout(
         height=900,
@@ -147,35 +159,50 @@ with tab_spec:
 
     st.markdown("### 🎛️ Power Spectrogram")
 
-    # Determine sampling frequency
-    dt_ns = np.median(np.diff(y.index.asi8))
+    # Sampling frequency in samples per hour, read from the regular index
+    # that resample("h") leaves; the median step is only a fallback
+    if y.index.freq is not None:
+        dt_ns = y.index.freq.nanos
+    else:
+        dt_ns = np.median(np.diff(y.index.view("i8")))
     fs = 1.0 / (dt_ns / 3.6e12) if dt_ns > 0 else 1.0
 
     nper = int(window_len)
     nover = min(int(overlap * nper), nper - 1)
 
-    f, t, Sxx = spectrogram(
-        y.values,
-        fs=fs,
-        window="hann",
-        nperseg=nper,
-        noverlap=nover,
-        detrend="constant",
-        scaling="density",
-        mode="psd",
-    )
+    # float32 halves the segment buffers and the heatmap payload; the
+    # short-time FFTs run on all cores (spectrogram uses scipy.fft)
+    with set_workers(-1):
+        f, t, Sxx = spectrogram(
+            y.to_numpy(np.float32),
+            fs=fs,
+            window="hann",
+            nperseg=nper,
+            noverlap=nover,
+            detrend="constant",
+            scaling="density",
+            mode="psd",
+        )
+
+    # Block-average to a bounded grid: the browser draws at most
+    # HEATMAP_CELLS^2 cells however long the series is
+    f = bin_mean(f, 0)
+    t = bin_mean(t, 0)
+    Sxx = bin_mean(bin_mean(Sxx, 0), 1)
 
     # Convert spectrogram time scale to timestamps
     start_ts = y.index[0]
     t_axis = pd.to_datetime(start_ts) + pd.to_timedelta(t, unit="h")
 
-    # Build heatmap
+    # Build heatmap (log10 power, so weak bands stay visible)
     fig_spec = go.Figure(
         data=go.Heatmap(
             x=t_axis,
             y=f,
-            z=Sxx,
-            colorscale="Viridis"
+            z=np.log10(Sxx + 1e-12, dtype=np.float32),
+            colorscale="Viridis",
+            colorbar=dict(title="log₁₀ PSD"),
+            zsmooth="best",
         )
     )
     fig_spec.update_layout(
@@ -1,11 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
-from pymongo import MongoClient
-import certifi
 import plotly.express as px
 from sidebar import navigation
+from era5_client import fetch_hourly
+from data_loader import load_energy_catalogue, load_area_hourly, thin_for_display
 
 # ---------------------------------------------------------
 # Page configuration
@@ -28,8 +27,6 @@ over time using a **sliding-window correlation**.
 # ---------------------------------------------------------
 # Constants
 # ---------------------------------------------------------
-ERA5_URL = "https://archive-api.open-meteo.com/v1/era5"
-
 PRICE_AREAS = {
     "NO1": {"city": "Oslo", "lat": 59.9139, "lon": 10.7522},
     "NO2": {"city": "Kristiansand", "lat": 58.1467, "lon": 7.9956},
@@ -49,47 +46,75 @@ METEO_VARS = [
 # ---------------------------------------------------------
 # Data loading
 # ---------------------------------------------------------
-@st.cache_data(ttl=300, show_spinner=True)
-def load_energy_from_mongo() -> pd.DataFrame:
-    cfg = st.secrets["mongo"]
-    client = MongoClient(cfg["uri"], tlsCAFile=certifi.where())
-    col = client[cfg.get("database", "elhub")][cfg.get("collection", "df_clean")]
-    df = pd.DataFrame(list(col.find({}, {"_id": 0})))
-
-    df["starttime"] = pd.to_datetime(df["starttime"], utc=True, errors="coerce")
-    df["quantitykwh"] = pd.to_numeric(df["quantitykwh"], errors="coerce")
-    df = df.dropna(subset=["starttime", "quantitykwh"])
-    return df.set_index("starttime").sort_index()
-
-
 @st.cache_data(show_spinner=True)
 def fetch_era5_hourly(lat, lon, start_date, end_date):
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": ",".join(METEO_VARS),
-        "timezone": "UTC",
-    }
-    r = requests.get(ERA5_URL, params=params)
-    r.raise_for_status()
-    df = pd.DataFrame(r.json().get("hourly", {}))
-    df["time"] = pd.to_datetime(df["time"], utc=True)
+    df = fetch_hourly(lat, lon, start_date, end_date, METEO_VARS)
+    df["time"] = df["time"].dt.tz_localize("UTC")
     return df.set_index("time").sort_index()
 
 # ---------------------------------------------------------
 # Helper
 # ---------------------------------------------------------
+def _window_sums(a, w):
+    """Sum over every length-w window, from one cumulative sum."""
+    c = np.concatenate(([0.0], np.cumsum(a)))
+    return c[w:] - c[:-w]
+
+
 def sliding_corr(df, window_hours):
-    corr = df["energy_kwh"].rolling(window_hours).corr(df["meteo"])
-    return pd.DataFrame({"time": df.index, "corr": corr}).dropna()
+    """Pearson correlation over each trailing window, in O(N).
+
+    Same values as rolling(window).corr(), built from cumulative sums of
+    x, y, x², y² and xy. Both series are standardized first, which leaves r
+    unchanged but keeps the running sums small enough for float64.
+    """
+    w = int(window_hours)
+    if w < 2 or len(df) < w:
+        return pd.DataFrame({"time": df.index[:0], "corr": np.empty(0)})
+
+    x = df["energy_kwh"].to_numpy(np.float64)
+    y = df["meteo"].to_numpy(np.float64)
+    x = (x - x.mean()) / (x.std() or 1.0)
+    y = (y - y.mean()) / (y.std() or 1.0)
+
+    sx, sy = _window_sums(x, w), _window_sums(y, w)
+    sxy = w * _window_sums(x * y, w) - sx * sy
+    vx = w * _window_sums(x * x, w) - sx * sx
+    vy = w * _window_sums(y * y, w) - sy * sy
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = sxy / np.sqrt(vx * vy)
+    # Flat windows have no defined correlation (rolling.corr gives NaN too)
+    corr[(vx <= 1e-12 * w * w) | (vy <= 1e-12 * w * w)] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+
+    return pd.DataFrame({"time": df.index[w - 1:], "corr": corr}).dropna()
+
+
+def align_hourly(energy, meteo):
+    """Join two hourly series on their overlapping hours, dropping NaN rows.
+
+    Both come on a gap-free hourly grid, so the overlap is a plain slice of
+    each; the general index union is only the fallback for irregular input.
+    """
+    if energy.empty or meteo.empty:
+        return pd.DataFrame(columns=[energy.name, meteo.name], dtype=float)
+
+    lo = max(energy.index[0], meteo.index[0])
+    hi = min(energy.index[-1], meteo.index[-1])
+    e, m = energy.loc[lo:hi], meteo.loc[lo:hi]
+    if len(e) == len(m) and e.index.equals(m.index):
+        return pd.DataFrame(
+            {energy.name: e.to_numpy(), meteo.name: m.to_numpy()}, index=e.index
+        ).dropna()
+    return pd.concat([energy, meteo], axis=1).dropna()
+
 
 # ---------------------------------------------------------
 # UI – Controls (no sidebar)
 # ---------------------------------------------------------
 try:
-    energy_full = load_energy_from_mongo()
+    catalogue = load_energy_catalogue()
 except Exception as e:
     st.error(str(e))
     st.stop()
@@ -101,10 +126,10 @@ col1, col2 = st.columns(2)
 with col1:
     price_area = st.selectbox(
         "Price Area",
-        sorted(energy_full["pricearea"].dropna().unique())
+        catalogue["pricearea"].unique()
     )
 
-    groups = ["All"] + sorted(energy_full["productiongroup"].dropna().unique())
+    groups = ["All"] + sorted(catalogue["productiongroup"].unique())
     group = st.selectbox("Production Group", groups)
 
     meteo_var = st.selectbox("Meteorological Variable", METEO_VARS)
@@ -113,10 +138,10 @@ with col2:
     window_hours = st.slider("Window Size (hours)", 24, 24*60, 24*14, step=24)
     lag_hours = st.slider("Lag (hours, meteo → energy)", -72, 72, 0, step=6)
 
-    df_area = energy_full[energy_full["pricearea"] == price_area]
+    area_rows = catalogue[catalogue["pricearea"] == price_area]
     start_date, end_date = st.date_input(
         "Date Range",
-        value=(df_area.index.min().date(), df_area.index.max().date())
+        value=(area_rows["first"].min().date(), area_rows["last"].max().date())
     )
 
 run_btn = st.button("🚀 Run Sliding Correlation", type="primary")
@@ -135,13 +160,13 @@ with st.spinner("Fetching ERA5 and preparing data..."):
         coords["lat"], coords["lon"], str(start_date), str(end_date)
     )
 
-    e = energy_full[energy_full["pricearea"] == price_area].copy()
-    if group != "All":
-        e = e[e["productiongroup"] == group]
-
-    energy_hourly = (
-        e["quantitykwh"].resample("H").sum()
-    ).rename("energy_kwh").loc[str(start_date):str(end_date)]
+    energy_hourly = load_area_hourly(price_area, group).rename("energy_kwh")
+    # Whole days [start_date, end_date] via binary search on the sorted index
+    i0, i1 = energy_hourly.index.searchsorted([
+        pd.Timestamp(start_date, tz="UTC"),
+        pd.Timestamp(end_date, tz="UTC") + pd.Timedelta(days=1),
+    ])
+    energy_hourly = energy_hourly.iloc[i0:i1]
 
     meteo_series = meteo_df[meteo_var].rename("meteo").shift(lag_hours, freq="H")
 
@@ -158,7 +183,7 @@ with st.spinner("Fetching ERA5 and preparing data..."):
     else:
         meteo_series.index = meteo_series.index.tz_convert("UTC")
 
-    df_join = pd.concat([energy_hourly, meteo_series], axis=1).dropna()
+    df_join = align_hourly(energy_hourly, meteo_series)
 
 if df_join.empty:
     st.warning("No overlapping data after applying filters, date range, or lag.")
@@ -186,7 +211,7 @@ st.plotly_chart(fig_corr, use_container_width=True)
 
 # ---------------- Time-Series Plot --------------------
 st.subheader("🔍 Aligned Time Series")
-st.line_chart(df_join, use_container_width=True)
+st.line_chart(thin_for_display(df_join), use_container_width=True)
 
 # ---------------- Raw Data ----------------------------
 with st.expander("🗂 Data Preview"):
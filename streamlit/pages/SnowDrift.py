@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date
 from sidebar import navigation
+from era5_client import fetch_hourly
 
 # ---------------------------------------------------------
 # Page config
@@ -33,27 +33,42 @@ and the **Tabler (2003)** formula.
 DEFAULT_T = 3000
 DEFAULT_F = 30000
 DEFAULT_THETA = 0.5
+FENCE_FACTORS = {"wyoming": 8.5, "slat-and-wire": 7.7, "slat and wire": 7.7, "solid": 2.9}
+FENCE_EXPONENT = 1 / 2.2
+ERA5_VARS = ["temperature_2m", "precipitation", "windspeed_10m", "winddirection_10m"]
 
 # ---------------------------------------------------------
 # Snow Drift Functions
 # ---------------------------------------------------------
-def compute_Qupot(hourly_wind_speeds, dt=3600):
-    return sum((u ** 3.8) * dt for u in hourly_wind_speeds) / 233_847
+def hourly_transport(hourly_wind_speeds, dt=3600):
+    """Per-hour potential transport u^3.8·dt/233847; missing hours count as zero."""
+    ws = np.asarray(hourly_wind_speeds, dtype=float)
+    return np.nan_to_num(np.power(ws, 3.8) * dt / 233_847)
 
 def sector_index(direction):
-    return int(((direction + 11.25) % 360) // 22.5)
-
-def compute_sector_transport(hourly_wind_speeds, hourly_wind_dirs, dt=3600):
-    sectors = [0.0] * 16
-    for u, d in zip(hourly_wind_speeds, hourly_wind_dirs):
-        sectors[sector_index(d)] += ((u ** 3.8) * dt) / 233_847
-    return sectors
-
-def compute_snow_transport(T, F, theta, Swe, hourly_wind_speeds):
-    Qupot = compute_Qupot(hourly_wind_speeds)
+    # float32 in, int8 out: 16 sectors fit in a byte
+    wdir = np.asarray(direction, dtype=np.float32)
+    return np.floor_divide(np.mod(wdir + np.float32(11.25), np.float32(360.0)), np.float32(22.5)).astype(np.int8)
+
+def season_keys(time):
+    """Season year (July → June) and calendar month of each datetime64 timestamp."""
+    ym = np.asarray(time).astype("datetime64[M]").astype(np.int64)
+    years, months = ym // 12 + 1970, ym % 12 + 1
+    # Jan–Jun belong to the previous season year
+    return years - (months < 7), months
+
+def run_starts(keys):
+    """Index where each run of equal (sorted) keys starts, for np.add.reduceat."""
+    return np.r_[0, np.flatnonzero(np.diff(keys)) + 1]
+
+def compute_snow_transport(T, F, theta, Swe, Qupot):
+    """Tabler transport terms; Swe and Qupot may be scalars or aligned arrays."""
+    Swe = np.asarray(Swe, dtype=float)
+    Qupot = np.asarray(Qupot, dtype=float)
     Qspot = 0.5 * T * Swe
     Srwe = theta * Swe
-    Qinf = (0.5 * T * Srwe) if Qupot > Qspot else Qupot
+    snow_limited = Qupot > Qspot
+    Qinf = np.where(snow_limited, 0.5 * T * Srwe, Qupot)
     Qt = Qinf * (1 - 0.14 ** (F / T))
     return {
         "Qupot (kg/m)": Qupot,
@@ -61,81 +76,96 @@ def compute_snow_transport(T, F, theta, Swe, hourly_wind_speeds):
         "Srwe (mm)": Srwe,
         "Qinf (kg/m)": Qinf,
         "Qt (kg/m)": Qt,
-        "Control": "Snowfall controlled" if Qupot > Qspot else "Wind controlled",
+        "Control": np.where(snow_limited, "Snowfall controlled", "Wind controlled"),
     }
 
 def compute_fence_height(Qt, fence_type):
-    Qt_t = Qt / 1000
-    factors = {"wyoming": 8.5, "slat-and-wire": 7.7, "solid": 2.9}
-    f = factors.get(fence_type.lower(), 8.5)
-    return (Qt_t / f) ** (1 / 2.2)
-
-def compute_year_and_month_results(df, T, F, theta):
-    df = df.copy()
-    df["time"] = pd.to_datetime(df["time"])
-    df["season_year"] = df["time"].apply(lambda dt: dt.year if dt.month >= 7 else dt.year - 1)
-    df["month"] = df["time"].dt.month
-
-    yearly, monthly = [], []
-
-    for s, g in df.groupby("season_year"):
-        g = g.copy()
-        g["Swe_hourly"] = np.where(g["temperature_2m"] < 1.0, g["precipitation"], 0)
-        Swe = g["Swe_hourly"].sum()
-        ws = g["windspeed_10m"].tolist()
-
-        yr = compute_snow_transport(T, F, theta, Swe, ws)
-        yr["season"] = f"{s}-{s+1}"
-        yearly.append(yr)
-
-        for m, gm in g.groupby("month"):
-            gm = gm.copy()
-            Swe_m = gm["Swe_hourly"].sum()
-            ws_m = gm["windspeed_10m"].tolist()
-            if Swe_m == 0 or len(ws_m) == 0:
-                continue
-            mm = compute_snow_transport(T, F, theta, Swe_m, ws_m)
-            mm["season"] = f"{s}-{s+1}"
-            mm["month"] = m
-            monthly.append(mm)
-
-    return pd.DataFrame(yearly), pd.DataFrame(monthly)
-
-def compute_average_sector(df):
-    df = df.copy()
-    df["time"] = pd.to_datetime(df["time"])
-    df["season_year"] = df["time"].apply(lambda dt: dt.year if dt.month >= 7 else dt.year - 1)
-
-    all_sectors = []
-    for _, g in df.groupby("season_year"):
-        g["Swe_hourly"] = np.where(g["temperature_2m"] < 1.0, g["precipitation"], 0)
-        ws = g["windspeed_10m"].tolist()
-        wd = g["winddirection_10m"].tolist()
-        all_sectors.append(compute_sector_transport(ws, wd))
-
-    return np.mean(all_sectors, axis=0) if all_sectors else np.zeros(16)
+    factor = FENCE_FACTORS.get(fence_type.lower())
+    if factor is None:
+        raise ValueError(f"Unknown fence type: {fence_type!r}")
+    return (np.asarray(Qt, dtype=float) / 1000 / factor) ** FENCE_EXPONENT
+
+def compute_year_and_month_results(met, T, F, theta):
+    order = np.argsort(met["time"], kind="stable")
+    time = met["time"][order]
+    if time.size == 0:
+        return pd.DataFrame(), pd.DataFrame()
+
+    season, month = season_keys(time)
+    temp, precip = met["temperature_2m"][order], met["precipitation"][order]
+    swe = np.nan_to_num(np.where(temp < 1.0, precip, 0.0))
+    qu = met["transport"][order]
+
+    # Time-sorted hours form contiguous runs per season and per month,
+    # so every total is one np.add.reduceat over the run starts
+    starts = run_starts(season)
+    yearly = pd.DataFrame(compute_snow_transport(
+        T, F, theta, np.add.reduceat(swe, starts), np.add.reduceat(qu, starts)
+    ))
+    yearly["season"] = [f"{s}-{s+1}" for s in season[starts]]
+
+    starts = run_starts(time.astype("datetime64[M]"))
+    swe_m, qu_m = np.add.reduceat(swe, starts), np.add.reduceat(qu, starts)
+    season_m, month_m = season[starts], month[starts]
+    # Months with snowfall only, ordered by season then calendar month
+    keep = np.flatnonzero(swe_m != 0)
+    keep = keep[np.lexsort((month_m[keep], season_m[keep]))]
+
+    monthly = pd.DataFrame(compute_snow_transport(T, F, theta, swe_m[keep], qu_m[keep]))
+    monthly["season"] = [f"{s}-{s+1}" for s in season_m[keep]]
+    monthly["month"] = month_m[keep]
+
+    return yearly, monthly
+
+def compute_average_sector(met):
+    season, _ = season_keys(met["time"])
+    seasons, season_idx = np.unique(season, return_inverse=True)
+    if len(seasons) == 0:
+        return np.zeros(16)
+
+    # One bincount over (season, sector) cells instead of a loop per season
+    wdir = met["winddirection_10m"]
+    ok = np.isfinite(wdir)
+    cells = season_idx[ok] * 16 + sector_index(wdir[ok])
+    weights = met["transport"][ok]
+    per_season = np.bincount(cells, weights=weights, minlength=len(seasons) * 16)
+    return per_season.reshape(len(seasons), 16).mean(axis=0)
 
 # ---------------------------------------------------------
 # ERA5 loader
 # ---------------------------------------------------------
 @st.cache_data(show_spinner=True)
-def fetch_era5_hourly(lat, lon, start_date, end_date):
-    r = requests.get(
-        "https://archive-api.open-meteo.com/v1/era5",
-        params={
-            "latitude": lat,
-            "longitude": lon,
-            "start_date": start_date,
-            "end_date": end_date,
-            "hourly": "temperature_2m,precipitation,windspeed_10m,winddirection_10m",
-            "timezone": "UTC",
-        },
-        timeout=60
+def fetch_era5_hourly(lat, lon, start_year, end_year):
+    """Hourly ERA5 series as arrays: datetime64 'time', float32 variables and 'transport'.
+
+    Requested one July → June season at a time, so each season is its own
+    on-disk cache entry and widening the range only downloads new seasons.
+    'transport' is the per-hour u^3.8 term, evaluated once per fetch and
+    shared by the seasonal, monthly and wind-rose sums.
+    """
+    df = pd.concat(
+        [
+            fetch_hourly(lat, lon, f"{year}-07-01", f"{year+1}-06-30", ERA5_VARS)
+            for year in range(start_year, end_year + 1)
+        ],
+        ignore_index=True,
     )
-    r.raise_for_status()
-    df = pd.DataFrame(r.json()["hourly"])
-    df["time"] = pd.to_datetime(df["time"])
-    return df
+    met = {"time": df["time"].to_numpy()}
+    for var in ERA5_VARS:
+        met[var] = df[var].to_numpy(np.float32)
+    met["transport"] = hourly_transport(met["windspeed_10m"])
+    return met
+
+
+@st.cache_data(show_spinner=False)
+def compute_results(lat, lon, start_year, end_year, T, F, theta):
+    """Seasonal/monthly Qt and mean wind-rose sectors for one configuration.
+
+    Cached on the inputs, so changing only the fence type reuses it.
+    """
+    met = fetch_era5_hourly(lat, lon, start_year, end_year)
+    yearly, monthly = compute_year_and_month_results(met, T, F, theta)
+    return yearly, monthly, compute_average_sector(met)
 
 # ---------------------------------------------------------
 # TOP CONFIGURATION PANEL
@@ -201,24 +231,13 @@ if not run:
     st.stop()
 
 # ---------------------------------------------------------
-# FETCH ERA5 DATA
+# FETCH ERA5 DATA + CALCULATE RESULTS
 # ---------------------------------------------------------
-with st.spinner("Fetching ERA5 data…"):
-    df_raw = fetch_era5_hourly(
-        lat, lon,
-        f"{start_year}-07-01",
-        f"{end_year+1}-06-30"
-    )
-
-# ---------------------------------------------------------
-# CALCULATE RESULTS
-# ---------------------------------------------------------
-with st.spinner("Computing snow drift metrics…"):
-    yearly, monthly = compute_year_and_month_results(df_raw, T, F, theta)
-    avg_sector = compute_average_sector(df_raw)
+with st.spinner("Fetching ERA5 data and computing snow drift metrics…"):
+    yearly, monthly, avg_sector = compute_results(lat, lon, start_year, end_year, T, F, theta)
 
 yearly["Qt (tonnes/m)"] = yearly["Qt (kg/m)"] / 1000
-yearly["Fence height (m)"] = yearly["Qt (kg/m)"].apply(lambda q: compute_fence_height(q, fence_type))
+yearly["Fence height (m)"] = compute_fence_height(yearly["Qt (kg/m)"].to_numpy(), fence_type)
 
 # ---------------------------------------------------------
 # Plot builders
@@ -236,12 +255,13 @@ def plot_yearly_bar():
 def plot_monthly_bar():
     if monthly.empty:
         return None
-    mdf = monthly.copy()
-    mdf["Qt (tonnes/m)"] = mdf["Qt (kg/m)"] / 1000
-    mdf["month_name"] = mdf["month"].map({
-        1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"May",6:"Jun",
-        7:"Jul",8:"Aug",9:"Sep",10:"Oct",11:"Nov",12:"Dec"
-    })
+    mdf = monthly.assign(
+        **{"Qt (tonnes/m)": monthly["Qt (kg/m)"] / 1000},
+        month_name=monthly["month"].map({
+            1:"Jan",2:"Feb",3:"Mar",4:"Apr",5:"May",6:"Jun",
+            7:"Jul",8:"Aug",9:"Sep",10:"Oct",11:"Nov",12:"Dec"
+        }),
+    )
     return px.bar(
         mdf,
         x="month_name", y="Qt (tonnes/m)",
@@ -1,17 +1,17 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-import requests
 import altair as alt
 from scipy.fft import dct, idct
-from sklearn.neighbors import LocalOutlierFactor
 from sidebar import navigation
+from era5_client import fetch_hourly
+from data_loader import thin_for_display
 
 # ---------------------------------------------------------
 # PAGE SETUP
 # ---------------------------------------------------------
 st.set_page_config(page_title="Weather Anomalies", layout="wide")
-st.title("🌡️ Weather & Production Anomalies (DCT • SPC • LOF)")
+st.title("🌡️ Weather & Production Anomalies (DCT • SPC • Quantile)")
 
 navigation()
 
@@ -19,7 +19,7 @@ st.markdown("""
 This dashboard highlights **meteorological anomalies** using:
 
 - **DCT high-pass filtering + SPC** (for temperature)
-- **Local Outlier Factor (LOF)** (for precipitation)
+- **Upper-quantile threshold** (for precipitation)
 
 Use the tabs to explore different anomaly detection methods.
 """)
@@ -35,7 +35,6 @@ PRICE_AREAS = {
     "NO5": {"city": "Bergen", "lat": 60.3913, "lon": 5.3221},
 }
 
-ERA5_URL = "https://archive-api.open-meteo.com/v1/era5"
 ERA5_VARS = [
     "temperature_2m", "precipitation", "windspeed_10m",
     "windgusts_10m", "winddirection_10m"
@@ -46,20 +45,35 @@ ERA5_VARS = [
 # ---------------------------------------------------------
 @st.cache_data(show_spinner=True)
 def fetch_era5(lat: float, lon: float, year: int = 2021, tz: str = "Europe/Oslo") -> pd.DataFrame:
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": f"{year}-01-01",
-        "end_date": f"{year}-12-31",
-        "hourly": ",".join(ERA5_VARS),
-        "timezone": tz,
-    }
-    r = requests.get(ERA5_URL, params=params, timeout=60)
-    r.raise_for_status()
-    df = pd.DataFrame(r.json().get("hourly", {}))
-    df["time"] = pd.to_datetime(df["time"])
+    df = fetch_hourly(lat, lon, f"{year}-01-01", f"{year}-12-31", ERA5_VARS, tz=tz)
     return df.set_index("time").sort_index()
 
+# ---------------------------------------------------------
+# DCT HIGH-PASS (cached)
+# ---------------------------------------------------------
+@st.cache_data(show_spinner=False, max_entries=32)
+def dct_highpass(temp: np.ndarray, freq_cutoff: int):
+    """High-pass residual of temp plus its median and robust (MAD) std.
+
+    Cached per (series, cutoff): moving only the sigma slider re-draws the
+    limits without repeating the transforms.
+    """
+    n = temp.size
+    k = max(1, min(freq_cutoff, n - 1))
+
+    # High-pass in place: zero the low-frequency coefficients, invert into the same buffer
+    coeffs = dct(temp, norm="ortho", workers=-1)
+    coeffs[:k] = 0
+    satv = idct(coeffs, norm="ortho", overwrite_x=True, workers=-1)
+
+    # np.median partitions (no full sort); the deviations reuse one scratch buffer
+    med = np.median(satv)
+    dev = np.subtract(satv, med)
+    np.abs(dev, out=dev)
+    mad = np.median(dev, overwrite_input=True)
+    rstd = 1.4826 * mad if mad > 0 else np.std(satv)
+    return satv, med, rstd
+
 # ---------------------------------------------------------
 # AREA PICKER
 # ---------------------------------------------------------
@@ -81,7 +95,7 @@ st.markdown("---")
 # ---------------------------------------------------------
 # TABS
 # ---------------------------------------------------------
-tab_stl, tab_lof = st.tabs(["🌡️ Temperature — DCT/SPC", "🌧️ Precipitation — LOF"])
+tab_stl, tab_precip = st.tabs(["🌡️ Temperature — DCT/SPC", "🌧️ Precipitation — Quantile"])
 
 # =========================================================
 # TAB 1 — DCT / SPC
@@ -109,17 +123,7 @@ with tab_stl:
     # Computation
     # -----------------------------------------------------
     temp = df["temperature_2m"].to_numpy(float)
-    n = temp.size
-    k = max(1, min(freq_cutoff, n - 1))
-
-    coeffs = dct(temp, norm="ortho")
-    hp = coeffs.copy()
-    hp[:k] = 0
-    satv = idct(hp, norm="ortho")
-
-    med = np.median(satv)
-    mad = np.median(np.abs(satv - med))
-    rstd = 1.4826 * mad if mad > 0 else np.std(satv)
+    satv, med, rstd = dct_highpass(temp, freq_cutoff)
 
     lo, hi = med - n_std * rstd, med + n_std * rstd
 
@@ -129,24 +133,27 @@ with tab_stl:
 
     mask = (satv < lo) | (satv > hi)
 
-    spc_df = df[["temperature_2m"]].copy()
-    spc_df["time"] = spc_df.index
-    spc_df["outlier"] = mask
-    spc_df["lower"] = lower_raw
-    spc_df["upper"] = upper_raw
+    spc_df = pd.DataFrame(
+        {"temperature_2m": temp, "lower": lower_raw, "upper": upper_raw},
+        index=df.index,
+    )
+    # Line and band share one thinned float32 frame (no tooltips); the
+    # outlier layer and table get only the flagged rows, at full precision
+    line_df = thin_for_display(spc_df).astype("float32").reset_index()
+    out_df = df.loc[mask, ["temperature_2m"]].reset_index()
 
     # ---------------------------------------------------------
     # Plot
     # ---------------------------------------------------------
-    base = alt.Chart(spc_df).mark_line().encode(
+    base = alt.Chart(line_df).mark_line().encode(
         x="time:T", y=alt.Y("temperature_2m:Q", title="Temperature (°C)")
     )
 
-    band = alt.Chart(spc_df).mark_area(opacity=0.15).encode(
+    band = alt.Chart(line_df).mark_area(opacity=0.15).encode(
         x="time:T", y="lower:Q", y2="upper:Q"
     )
 
-    outliers = alt.Chart(spc_df[spc_df["outlier"]]).mark_circle(size=45, color="red").encode(
+    outliers = alt.Chart(out_df).mark_circle(size=45, color="red").encode(
         x="time:T", y="temperature_2m:Q",
         tooltip=["time:T","temperature_2m:Q"]
     )
@@ -156,18 +163,15 @@ with tab_stl:
     st.metric("Detected anomalies", int(mask.sum()))
 
     with st.expander("📄 Show anomaly timestamps"):
-        outlier_df = pd.DataFrame({
-            "time": df.index[mask],
-            "temperature_2m": df["temperature_2m"][mask],
-        }).reset_index(drop=True)
+        outlier_df = out_df.reset_index(drop=True)
         st.dataframe(outlier_df, use_container_width=True)
 
 # =========================================================
-# TAB 2 — LOF for precipitation
+# TAB 2 — Quantile threshold for precipitation
 # =========================================================
-with tab_lof:
+with tab_precip:
 
-    st.subheader("🌧️ Precipitation Anomaly Detection (LOF)")
+    st.subheader("🌧️ Precipitation Anomaly Detection (Quantile Threshold)")
 
     cA, cB = st.columns(2)
     with cA:
@@ -175,23 +179,26 @@ with tab_lof:
     with cB:
         st.metric("Year loaded", year)
 
-    z = df[["precipitation"]].fillna(0.0)
-
-    lof = LocalOutlierFactor(contamination=prop)
-    pred = lof.fit_predict(z)
-
-    mask = pred == -1
-
-    lof_df = df.copy()
-    lof_df["time"] = lof_df.index
-    lof_df["outlier"] = mask
+    # Single feature: flag the top `prop` share of (non-zero) values
+    vals = df["precipitation"].fillna(0.0).to_numpy()
+    thr = np.quantile(vals, 1 - prop)
+    mask = (vals >= thr) & (vals > 0)
+    st.caption(f"Single feature: flagged values ≥ {thr:.2f} mm (the {1 - prop:.1%} quantile).")
+
+    # Bucket max keeps every shower peak on the line under its red point
+    line_df = (
+        thin_for_display(df[["precipitation"]], how="max")
+        .astype("float32")
+        .reset_index()
+    )
+    out_df = df.loc[mask, ["precipitation"]].reset_index()
 
-    base2 = alt.Chart(lof_df).mark_line().encode(
+    base2 = alt.Chart(line_df).mark_line().encode(
         x="time:T",
         y=alt.Y("precipitation:Q", title="Precipitation (mm)")
     )
 
-    out2 = alt.Chart(lof_df[lof_df["outlier"]]).mark_circle(size=45, color="red").encode(
+    out2 = alt.Chart(out_df).mark_circle(size=45, color="red").encode(
         x="time:T",
         y="precipitation:Q",
         tooltip=["time:T","precipitation:Q"]
@@ -202,8 +209,5 @@ with tab_lof:
     st.metric("Detected anomalies", int(mask.sum()))
 
     with st.expander("📄 Show anomaly timestamps"):
-        outlier_df = pd.DataFrame({
-            "time": df.index[mask],
-            "precipitation": df["precipitation"][mask],
-        }).reset_index(drop=True)
+        outlier_df = out_df.reset_index(drop=True)
         st.dataframe(outlier_df, use_container_width=True)